@@ -17,14 +17,34 @@
 # - The first time you run the app, a database file `events.db` will be created.
 # - An initial admin user will be created with username 'admin' and password 'password'.
 # - You can register new users (who will be 'attenders' by default) from the registration page.
+# - Set FLASK_DEBUG=0 to run without the debugger and reloader.
+# - QR codes are rendered by background worker threads. Set `JOBS_RUN_SYNC` to True to run
+#   queued jobs inline instead (e.g. in tests).
+# - Set `QR_CODE_FORMAT` to 'signed' and `QR_TOKEN_KEY` (or change `SECRET_KEY`) to issue
+#   compact signed QR codes. Existing UUID codes keep working alongside them.
+# - Admins can search users, events and locations from the Search page (SQLite FTS5).
+# - Finished schedules are moved to `archive.db` by a background job every
+#   `ARCHIVE_INTERVAL_HOURS`, or on demand from the admin dashboard or with
+#   `flask --app main_app archive-schedules`. Archived invitations can still be viewed.
 
 import os
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import re
+import struct
+import threading
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from functools import wraps
+from types import SimpleNamespace
 
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 import qrcode
@@ -32,10 +52,31 @@ from PIL import Image
 
 # --- Application Setup ---
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'a-very-secret-key-that-should-be-changed'
+DEFAULT_SECRET_KEY = 'a-very-secret-key-that-should-be-changed'
+app.config['SECRET_KEY'] = DEFAULT_SECRET_KEY
 basedir = os.path.abspath(os.path.dirname(__file__))
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'events.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Background jobs: set JOBS_RUN_SYNC to True (e.g. in tests) to run jobs inline when they are queued.
+app.config['JOBS_RUN_SYNC'] = False
+app.config['JOBS_WORKER_COUNT'] = 2
+app.config['JOBS_POLL_INTERVAL'] = 1.0  # Seconds an idle worker waits before checking the queue again
+app.config['JOBS_MAX_ATTEMPTS'] = 3
+app.config['JOBS_RETRY_BACKOFF'] = 5  # Seconds before the first retry, doubled after each failure
+app.config['JOBS_RETENTION_DAYS'] = 7  # Finished and failed jobs older than this are purged
+# Archival: schedules that ended more than ARCHIVE_RETENTION_DAYS ago are moved, with their
+# invitations and seatings, into a separate SQLite file that is only opened when needed.
+app.config['SQLALCHEMY_BINDS'] = {'archive': 'sqlite:///' + os.path.join(basedir, 'archive.db')}
+app.config['ARCHIVE_RETENTION_DAYS'] = 30
+app.config['ARCHIVE_INTERVAL_HOURS'] = 24  # How often the background archive job runs
+# QR code contents: 'uuid' encodes Invitation.qr_code_uid, 'signed' encodes a compact HMAC-signed
+# token that can be verified without a lookup. In 'signed' mode both formats are accepted when scanning.
+app.config['QR_CODE_FORMAT'] = 'uuid'
+# Key for signing QR tokens. Without it, tokens are keyed from SECRET_KEY, and signed mode stays
+# disabled while SECRET_KEY is the public default above.
+app.config['QR_TOKEN_KEY'] = os.environ.get('QR_TOKEN_KEY')
+app.config['SEARCH_PAGE_SIZE'] = 20
+app.config['SEARCH_AUTOCOMPLETE_LIMIT'] = 10
 
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
@@ -90,6 +131,9 @@ class Schedule(db.Model):
     location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=False)
     invitations = db.relationship('Invitation', backref='schedule', lazy='dynamic', cascade="all, delete-orphan")
 
+    # Never reuse IDs of archived rows, so archived and live records cannot collide.
+    __table_args__ = {'sqlite_autoincrement': True}
+
     def __repr__(self):
         return f'<Schedule for {self.event.name} at {self.start_time}>'
 
@@ -103,7 +147,8 @@ class Invitation(db.Model):
     qr_code_path = db.Column(db.String(200), nullable=True)
     seatings = db.relationship('Seating', backref='invitation', lazy='dynamic', cascade="all, delete-orphan")
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'schedule_id', name='_user_schedule_uc'),)
+    __table_args__ = (db.UniqueConstraint('user_id', 'schedule_id', name='_user_schedule_uc'),
+                      {'sqlite_autoincrement': True})
 
     def __repr__(self):
         return f'<Invitation for {self.attender.username} to {self.schedule.event.name}>'
@@ -114,9 +159,99 @@ class Seating(db.Model):
     seat_number = db.Column(db.String(20), nullable=False)
     invitation_id = db.Column(db.Integer, db.ForeignKey('invitation.id'), nullable=False)
 
+    __table_args__ = {'sqlite_autoincrement': True}
+
     def __repr__(self):
         return f'<Seat {self.seat_number}>'
 
+# --- Archive Models ---
+# These live in the 'archive' bind and keep the IDs of the live rows they replace.
+# Event and location details are copied so archived records still render on their own.
+
+class ArchivedSchedule(db.Model):
+    """Schedule that finished before the retention window."""
+    __bind_key__ = 'archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False, index=True)
+    event_id = db.Column(db.Integer, nullable=False)
+    event_name = db.Column(db.String(120), nullable=False)
+    event_description = db.Column(db.Text, nullable=True)
+    location_id = db.Column(db.Integer, nullable=False)
+    location_name = db.Column(db.String(120), nullable=False)
+    location_address = db.Column(db.String(200), nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    invitations = db.relationship('ArchivedInvitation', backref='schedule', lazy='dynamic', cascade="all, delete-orphan")
+
+    @property
+    def event(self):
+        return SimpleNamespace(id=self.event_id, name=self.event_name, description=self.event_description)
+
+    @property
+    def location(self):
+        return SimpleNamespace(id=self.location_id, name=self.location_name, address=self.location_address)
+
+    def __repr__(self):
+        return f'<ArchivedSchedule for {self.event_name} at {self.start_time}>'
+
+class ArchivedInvitation(db.Model):
+    """Invitation to an archived schedule."""
+    __bind_key__ = 'archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('archived_schedule.id'), nullable=False)
+    attended = db.Column(db.Boolean, default=False, nullable=False)
+    qr_code_uid = db.Column(db.String(36), unique=True, nullable=False)
+    qr_code_path = db.Column(db.String(200), nullable=True)
+    seatings = db.relationship('ArchivedSeating', backref='invitation', lazy='dynamic', cascade="all, delete-orphan")
+
+    @property
+    def attender(self):
+        # Users stay in the live database, so this cannot be a relationship.
+        return User.query.get(self.user_id)
+
+    def __repr__(self):
+        return f'<ArchivedInvitation {self.id}>'
+
+class ArchivedSeating(db.Model):
+    """Seating for an archived invitation."""
+    __bind_key__ = 'archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    seat_number = db.Column(db.String(20), nullable=False)
+    invitation_id = db.Column(db.Integer, db.ForeignKey('archived_invitation.id'), nullable=False)
+
+    def __repr__(self):
+        return f'<ArchivedSeat {self.seat_number}>'
+
+class Job(db.Model):
+    """Background job, persisted so queued work survives a restart."""
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(80), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON-encoded keyword arguments
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # 'queued', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task': self.task,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat(),
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.task} ({self.status})>'
+
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -134,9 +269,50 @@ def admin_required(f):
     return decorated_function
 
 # --- Helper Functions ---
+# Signed QR tokens: invitation ID and schedule ID packed as two 32-bit integers, followed by a
+# truncated HMAC-SHA256, base32-encoded. The 23 uppercase characters fit QR alphanumeric mode at
+# version 1, versus version 3 for a UUID. Changing the signing key invalidates issued tokens.
+QR_TOKEN_LENGTH = 23
+QR_TOKEN_MAC_SIZE = 6
+
+def _qr_token_key():
+    """Returns the token signing key, or None if only the public default secret is configured."""
+    secret = app.config['QR_TOKEN_KEY'] or app.config['SECRET_KEY']
+    if not secret or secret == DEFAULT_SECRET_KEY:
+        return None
+    return hmac.new(secret.encode(), b'qr-token', hashlib.sha256).digest()
+
+def signed_qr_codes_enabled():
+    """Signed tokens are only issued and accepted in 'signed' mode with a private key."""
+    return app.config['QR_CODE_FORMAT'] == 'signed' and _qr_token_key() is not None
+
+def _qr_token_mac(body):
+    return hmac.new(_qr_token_key(), body, hashlib.sha256).digest()[:QR_TOKEN_MAC_SIZE]
+
+def make_qr_token(invitation):
+    """Returns a compact signed token identifying an invitation and its schedule."""
+    body = struct.pack('>II', invitation.id, invitation.schedule_id)
+    return base64.b32encode(body + _qr_token_mac(body)).decode().rstrip('=')
+
+def read_qr_token(token):
+    """Returns (invitation_id, schedule_id) for a signed token, or None if it is malformed or forged."""
+    try:
+        raw = base64.b32decode(token + '=')
+    except (binascii.Error, ValueError):
+        return None
+    body, mac = raw[:8], raw[8:]
+    if len(raw) != 8 + QR_TOKEN_MAC_SIZE or not hmac.compare_digest(mac, _qr_token_mac(body)):
+        return None
+    return struct.unpack('>II', body)
+
 def generate_qr_code(invitation):
     """Generates a QR code for an invitation and saves it."""
-    qr_data = invitation.qr_code_uid
+    if signed_qr_codes_enabled():
+        qr_data = make_qr_token(invitation)
+    else:
+        if app.config['QR_CODE_FORMAT'] == 'signed':
+            app.logger.warning('Signed QR codes need QR_TOKEN_KEY or a non-default SECRET_KEY; using the UUID.')
+        qr_data = invitation.qr_code_uid
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -151,7 +327,7 @@ def generate_qr_code(invitation):
     static_dir = os.path.join(basedir, 'static', 'qrcodes')
     os.makedirs(static_dir, exist_ok=True)
     
-    filename = f'{qr_data}.png'
+    filename = f'{invitation.qr_code_uid}.png'
     filepath = os.path.join(static_dir, filename)
     img.save(filepath)
     
@@ -159,6 +335,303 @@ def generate_qr_code(invitation):
     db.session.commit()
 
 
+# --- Background Jobs ---
+# Slow side effects are queued in the `job` table and picked up by a pool of
+# worker threads, so request handlers can return immediately.
+JOB_TASKS = {}
+_job_wakeup = threading.Event()
+
+def job_task(f):
+    """Decorator to register a function as a background job task."""
+    JOB_TASKS[f.__name__] = f
+    return f
+
+def enqueue_job(task, run_at=None, **payload):
+    """Queues a registered task and returns its Job. Pass `run_at` to delay it.
+    In sync mode a job that is not delayed runs before returning."""
+    if task not in JOB_TASKS:
+        raise ValueError(f'Unknown job task: {task}')
+    job = Job(task=task, payload=json.dumps(payload), max_attempts=app.config['JOBS_MAX_ATTEMPTS'],
+              run_at=run_at or datetime.now())
+    db.session.add(job)
+    db.session.commit()
+    if app.config['JOBS_RUN_SYNC'] and run_at is None:
+        # Retries run straight away instead of waiting for the backoff.
+        while claim_job(job.id):
+            run_job(job)
+    else:
+        _job_wakeup.set()
+    return job
+
+def claim_job(job_id):
+    """Atomically marks a queued job as running. Returns False if another worker got it first."""
+    claimed = Job.query.filter_by(id=job_id, status='queued').update(
+        {'status': 'running', 'attempts': Job.attempts + 1}, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+def run_job(job):
+    """Runs a claimed job, scheduling a retry with exponential backoff if it fails."""
+    try:
+        JOB_TASKS[job.task](**json.loads(job.payload))
+    except Exception as e:
+        db.session.rollback()
+        job.last_error = f'{type(e).__name__}: {e}'
+        if job.attempts < job.max_attempts:
+            backoff = app.config['JOBS_RETRY_BACKOFF'] * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.run_at = datetime.now() + timedelta(seconds=backoff)
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.now()
+    else:
+        job.status = 'done'
+        job.finished_at = datetime.now()
+    db.session.commit()
+
+def _job_worker():
+    """Worker loop: runs due jobs one at a time, sleeping while the queue is empty."""
+    while True:
+        with app.app_context():
+            claimed_id = None
+            try:
+                job = Job.query.filter(Job.status == 'queued', Job.run_at <= datetime.now()) \
+                    .order_by(Job.run_at, Job.id).first()
+                if job is not None:
+                    if claim_job(job.id):
+                        claimed_id = job.id
+                        run_job(job)
+                    continue
+            except Exception:
+                # e.g. "database is locked": keep the worker alive and give the job back to the queue.
+                db.session.rollback()
+                app.logger.exception('Background job worker error')
+                if claimed_id is not None:
+                    _requeue_job(claimed_id)
+        _job_wakeup.wait(app.config['JOBS_POLL_INTERVAL'])
+        _job_wakeup.clear()
+
+def _requeue_job(job_id):
+    """Puts a job that a worker could not finish back in the queue, after the retry backoff."""
+    try:
+        Job.query.filter_by(id=job_id, status='running').update(
+            {'status': 'queued', 'run_at': datetime.now() + timedelta(seconds=app.config['JOBS_RETRY_BACKOFF'])})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Could not requeue job %s', job_id)
+
+def purge_finished_jobs():
+    """Deletes done and failed jobs older than JOBS_RETENTION_DAYS. Returns the number deleted."""
+    cutoff = datetime.now() - timedelta(days=app.config['JOBS_RETENTION_DAYS'])
+    deleted = Job.query.filter(Job.status.in_(('done', 'failed')), Job.finished_at < cutoff) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def start_job_workers():
+    """Requeues jobs interrupted by a restart and starts the worker thread pool."""
+    with app.app_context():
+        Job.query.filter_by(status='running').update({'status': 'queued'})
+        db.session.commit()
+    for i in range(app.config['JOBS_WORKER_COUNT']):
+        threading.Thread(target=_job_worker, name=f'job-worker-{i}', daemon=True).start()
+
+@job_task
+def render_qr_code(invitation_id):
+    invitation = Invitation.query.get(invitation_id)
+    if invitation:
+        generate_qr_code(invitation)
+
+
+# --- Full-Text Search ---
+# SQLite FTS5 indexes over the live tables, kept in sync by triggers. Results are ranked with
+# bm25 using the per-column weights below, and the prefix indexes keep autocomplete fast.
+SEARCH_INDEXES = {
+    'users': (User, 'search_user', ('username',), (1.0,)),
+    'events': (Event, 'search_event', ('name', 'description'), (10.0, 1.0)),
+    'locations': (Location, 'search_location', ('name', 'address'), (10.0, 2.0)),
+}
+
+def init_search_index():
+    """Creates the FTS5 tables and their sync triggers, building any index that is new."""
+    for model, fts, columns, weights in SEARCH_INDEXES.values():
+        table = model.__tablename__
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': fts}).first()
+        cols = ', '.join(columns)
+        new_values = ', '.join(f'new.{c}' for c in columns)
+        old_values = ', '.join(f'old.{c}' for c in columns)
+        insert = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});"
+        delete = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});"
+        for statement in (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON "{table}" BEGIN {insert} END',
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON "{table}" BEGIN {delete} END',
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON "{table}" BEGIN {delete} {insert} END',
+        ):
+            db.session.execute(text(statement))
+        if not exists:
+            db.session.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+    db.session.commit()
+
+def _fts_query(q):
+    """Turns free text into an FTS5 query that matches every word as a prefix."""
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', q or ''))
+
+def search_records(kind, q, page=1, per_page=None, **filters):
+    """Runs a ranked full-text search over one of SEARCH_INDEXES.
+    `filters` are exact matches on columns of the indexed table.
+    Returns (records, has_next)."""
+    model, fts, columns, weights = SEARCH_INDEXES[kind]
+    per_page = per_page or app.config['SEARCH_PAGE_SIZE']
+    match = _fts_query(q)
+    if not match:
+        return [], False
+    table = model.__tablename__
+    params = {'match': match, 'limit': per_page + 1, 'offset': (max(page, 1) - 1) * per_page}
+    where = ''.join(f' AND "{table}".{column} = :{column}' for column in filters)
+    params.update(filters)
+    ids = db.session.execute(text(
+        f'SELECT {fts}.rowid FROM {fts} JOIN "{table}" ON "{table}".id = {fts}.rowid '
+        f'WHERE {fts} MATCH :match{where} '
+        f'ORDER BY bm25({fts}, {", ".join(str(w) for w in weights)}) LIMIT :limit OFFSET :offset'
+    ), params).scalars().all()
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    records = {record.id: record for record in model.query.filter(model.id.in_(ids))}
+    return [records[i] for i in ids if i in records], has_next
+
+
+# --- Archival ---
+# Live tables whose IDs are kept in the archive, paired with their archive models.
+ARCHIVED_TABLES = ((Schedule, ArchivedSchedule), (Invitation, ArchivedInvitation), (Seating, ArchivedSeating))
+
+def ensure_autoincrement_ids():
+    """Makes sure new live rows can never take the ID of an archived row.
+    Tables created before archival existed are rebuilt with AUTOINCREMENT, and each ID
+    sequence is raised above the highest archived ID."""
+    for model, archived_model in ARCHIVED_TABLES:
+        table = model.__tablename__
+        sql = db.session.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table}).scalar()
+        if sql is None:
+            continue
+        if 'AUTOINCREMENT' not in sql.upper():
+            # SQLite cannot add AUTOINCREMENT in place, so copy into a new table and swap it in.
+            db.session.commit()
+            create = str(CreateTable(model.__table__).compile(db.engine)).strip()
+            create = create.replace(f'CREATE TABLE {table} (', f'CREATE TABLE {table}_new (', 1)
+            columns = ', '.join(column.name for column in model.__table__.columns)
+            connection = db.engine.raw_connection()
+            try:
+                connection.driver_connection.executescript(f"""
+                    BEGIN;
+                    {create};
+                    INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table};
+                    DROP TABLE {table};
+                    ALTER TABLE {table}_new RENAME TO {table};
+                    COMMIT;
+                """)
+            finally:
+                connection.close()
+        highest_archived = db.session.query(db.func.max(archived_model.id)).scalar() or 0
+        db.session.execute(text(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT :name, 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"), {'name': table})
+        db.session.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :name AND seq < :seq"),
+                           {'name': table, 'seq': highest_archived})
+    db.session.commit()
+
+@job_task
+def archive_past_schedules(retention_days=None):
+    """Moves schedules that ended more than `retention_days` ago, with their invitations and
+    seatings, into the archive database. Returns the number of schedules archived."""
+    if retention_days is None:
+        retention_days = app.config['ARCHIVE_RETENTION_DAYS']
+    ensure_autoincrement_ids()
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    archived_count = 0
+    for schedule in Schedule.query.filter(Schedule.end_time < cutoff).all():
+        existing = ArchivedSchedule.query.get(schedule.id)
+        if existing is None:
+            archived = ArchivedSchedule(
+                id=schedule.id, start_time=schedule.start_time, end_time=schedule.end_time,
+                event_id=schedule.event_id, event_name=schedule.event.name,
+                event_description=schedule.event.description,
+                location_id=schedule.location_id, location_name=schedule.location.name,
+                location_address=schedule.location.address)
+            for invitation in schedule.invitations:
+                archived_invitation = ArchivedInvitation(
+                    id=invitation.id, user_id=invitation.user_id, attended=invitation.attended,
+                    qr_code_uid=invitation.qr_code_uid, qr_code_path=invitation.qr_code_path)
+                for seating in invitation.seatings:
+                    archived_invitation.seatings.append(
+                        ArchivedSeating(id=seating.id, seat_number=seating.seat_number))
+                archived.invitations.append(archived_invitation)
+            db.session.add(archived)
+            # Commit the copy before deleting the live rows, so a failure in between can
+            # leave a duplicate behind but never lose the schedule.
+            db.session.commit()
+        elif (existing.start_time, existing.end_time, existing.event_id) != \
+                (schedule.start_time, schedule.end_time, schedule.event_id):
+            # The archive holds a different schedule under this ID; keep the live one.
+            app.logger.warning('Not archiving schedule %s: its ID is already used in the archive.', schedule.id)
+            continue
+        # Otherwise a previous run copied this schedule but stopped before deleting it.
+        db.session.delete(schedule)
+        db.session.commit()
+        archived_count += 1
+    return archived_count
+
+def schedule_archive_job(delay_hours=None):
+    """Queues the next periodic archive run, unless one is already waiting."""
+    if Job.query.filter_by(task='archive_periodically', status='queued').first():
+        return
+    if delay_hours is None:
+        delay_hours = app.config['ARCHIVE_INTERVAL_HOURS']
+    enqueue_job('archive_periodically', run_at=datetime.now() + timedelta(hours=delay_hours))
+
+@job_task
+def archive_periodically():
+    """Archives past schedules and old jobs and queues the next run, so live tables stay
+    proportional to upcoming events."""
+    schedule_archive_job()
+    archive_past_schedules()
+    purge_finished_jobs()
+
+@app.cli.command('archive-schedules')
+def archive_schedules_command():
+    """Archives finished schedules older than ARCHIVE_RETENTION_DAYS."""
+    db.create_all()
+    print(f'Archived {archive_past_schedules()} schedule(s).')
+
+
+# --- Startup ---
+# Runs once per process on the first request, so it works under `python main_app.py`,
+# `flask run` or any WSGI server alike.
+_startup_lock = threading.Lock()
+_started = False
+
+@app.before_request
+def ensure_started():
+    """Prepares the database and search index and starts the background job workers."""
+    global _started
+    if _started:
+        return
+    with _startup_lock:
+        if _started:
+            return
+        db.create_all()
+        ensure_autoincrement_ids()
+        init_search_index()
+        if not app.config['JOBS_RUN_SYNC']:
+            start_job_workers()
+            schedule_archive_job(delay_hours=0)
+        _started = True
+
+
 # --- Routes ---
 
 # --- Authentication Routes ---
@@ -235,13 +708,18 @@ def attender_dashboard():
 @app.route('/attender/invitation/<int:invitation_id>')
 @login_required
 def view_invitation(invitation_id):
-    invitation = Invitation.query.get_or_404(invitation_id)
+    invitation = Invitation.query.get(invitation_id)
+    archived = invitation is None
+    if archived:
+        # Past events may have been moved to the archive database
+        invitation = ArchivedInvitation.query.get_or_404(invitation_id)
     # Allow viewing of past events via this direct link
-    if invitation.attender.id != current_user.id and current_user.role != 'admin':
+    if invitation.user_id != current_user.id and current_user.role != 'admin':
         flash('You are not authorized to view this invitation.', 'danger')
         return redirect(url_for('dashboard'))
         
-    return render_template('view_invitation.html', title='Event Invitation', invitation=invitation)
+    return render_template('view_invitation.html', title='Event Invitation', invitation=invitation,
+                           archived=archived)
 
 # --- Admin Routes ---
 @app.route('/admin/dashboard')
@@ -251,11 +729,11 @@ def admin_dashboard():
     events = Event.query.all()
     locations = Location.query.all()
     schedules = Schedule.query.order_by(Schedule.start_time.desc()).all()
-    users = User.query.all()
+    # Attenders are picked through search autocomplete rather than listing every user
     invitations = Invitation.query.all()
     return render_template('admin_dashboard.html', title='Admin Dashboard',
                            events=events, locations=locations, schedules=schedules,
-                           users=users, invitations=invitations, now=datetime.now())
+                           invitations=invitations, now=datetime.now())
 
 # --- Admin: Events CRUD ---
 @app.route('/admin/event/add', methods=['POST'])
@@ -340,6 +818,14 @@ def add_schedule():
         
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/schedule/archive', methods=['POST'])
+@login_required
+@admin_required
+def archive_schedules():
+    enqueue_job('archive_past_schedules')
+    flash(f"Archiving schedules that ended more than {app.config['ARCHIVE_RETENTION_DAYS']} days ago.", 'info')
+    return redirect(url_for('admin_dashboard'))
+
 @app.route('/admin/schedule/delete/<int:schedule_id>', methods=['POST'])
 @login_required
 @admin_required
@@ -357,6 +843,11 @@ def delete_schedule(schedule_id):
 def add_invitation():
     user_id = request.form.get('user_id')
     schedule_id = request.form.get('schedule_id')
+    username = request.form.get('username')
+    # Accept a typed username when no autocomplete suggestion was picked
+    if not user_id and username:
+        user = User.query.filter_by(username=username, role='attender').first()
+        user_id = user.id if user else None
     
     if not user_id or not schedule_id:
         flash('User and Schedule are required.', 'danger')
@@ -371,8 +862,8 @@ def add_invitation():
     db.session.add(new_invitation)
     db.session.commit()
     
-    # Generate QR code after invitation is created and has an ID
-    generate_qr_code(new_invitation)
+    # Render the QR code in the background once the invitation has an ID
+    enqueue_job('render_qr_code', invitation_id=new_invitation.id)
     
     flash('Invitation sent successfully!', 'success')
     return redirect(url_for('admin_dashboard'))
@@ -396,26 +887,63 @@ def add_seating(invitation_id):
 @login_required
 @admin_required
 def scan_qr():
-    return render_template('scan_qr.html', title='Scan QR Code')
+    schedules = Schedule.query.filter(Schedule.end_time > datetime.now()).order_by(Schedule.start_time).all()
+    return render_template('scan_qr.html', title='Scan QR Code', schedules=schedules)
 
 @app.route('/admin/verify_attendance', methods=['POST'])
 @login_required
 @admin_required
 def verify_attendance():
     qr_uid = request.json.get('qr_data')
+    # Optional: the schedule being checked in at the scanner, to reject codes for other events.
+    expected_schedule_id = request.json.get('schedule_id')
     if not qr_uid:
         return jsonify({'success': False, 'message': 'No QR data received.'})
-        
-    invitation = Invitation.query.filter_by(qr_code_uid=qr_uid).first()
+    if not isinstance(qr_uid, str):
+        return jsonify({'success': False, 'message': 'Invalid QR Code. Invitation not found.'})
+    if expected_schedule_id not in (None, ''):
+        try:
+            expected_schedule_id = int(expected_schedule_id)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Invalid schedule selected.'})
+
+    marked = False
+    if signed_qr_codes_enabled() and len(qr_uid) == QR_TOKEN_LENGTH:
+        # Signed codes are validated without a lookup; the DB is only needed to flip `attended`.
+        token = read_qr_token(qr_uid)
+        if token is None:
+            return jsonify({'success': False, 'message': 'Invalid QR Code. Signature check failed.'})
+        invitation_id, schedule_id = token
+        if expected_schedule_id and schedule_id != expected_schedule_id:
+            return jsonify({'success': False, 'message': 'This QR Code is for a different event.'})
+        running_schedules = db.select(Schedule.id).where(Schedule.end_time >= datetime.now())
+        marked = Invitation.query.filter(
+            Invitation.id == invitation_id,
+            Invitation.schedule_id == schedule_id,
+            Invitation.attended.is_(False),
+            Invitation.schedule_id.in_(running_schedules),
+        ).update({'attended': True}, synchronize_session=False) == 1
+        db.session.commit()
+        # Anything else is looked up only to report who was scanned, or why it failed.
+        invitation = Invitation.query.filter_by(id=invitation_id, schedule_id=schedule_id).first()
+        archived = ArchivedInvitation.query.filter_by(id=invitation_id, schedule_id=schedule_id)
+    else:
+        invitation = Invitation.query.filter_by(qr_code_uid=qr_uid).first()
+        archived = ArchivedInvitation.query.filter_by(qr_code_uid=qr_uid)
     
     if not invitation:
+        if archived.first():
+            return jsonify({'success': False, 'message': 'This event has already ended. Cannot mark attendance.'})
         return jsonify({'success': False, 'message': 'Invalid QR Code. Invitation not found.'})
+
+    if expected_schedule_id and invitation.schedule_id != expected_schedule_id:
+        return jsonify({'success': False, 'message': 'This QR Code is for a different event.'})
     
     seats = [s.seat_number for s in invitation.seatings]
     seat_info = ', '.join(seats) if seats else 'No seat assigned'
     
     # Provide info even if already attended
-    if invitation.attended:
+    if invitation.attended and not marked:
         return jsonify({
             'success': False, 
             'message': 'Attendance was ALREADY marked for this user.',
@@ -427,7 +955,7 @@ def verify_attendance():
         })
     
     # Check if event has ended
-    if invitation.schedule.end_time < datetime.now():
+    if not marked and invitation.schedule.end_time < datetime.now():
         return jsonify({
             'success': False,
             'message': 'This event has already ended. Cannot mark attendance.',
@@ -451,10 +979,59 @@ def verify_attendance():
         }
     })
 
+# --- Admin: Search ---
+@app.route('/admin/search')
+@login_required
+@admin_required
+def search():
+    q = request.args.get('q', '')
+    kind = request.args.get('kind')
+    page = request.args.get('page', 1, type=int)
+    kinds = [kind] if kind in SEARCH_INDEXES else list(SEARCH_INDEXES)
+    results = {k: search_records(k, q, page if kind else 1) for k in kinds}
+    return render_template('search.html', title='Search', q=q, kind=kind if kind in SEARCH_INDEXES else None,
+                           page=page, results=results)
+
+@app.route('/admin/search/autocomplete')
+@login_required
+@admin_required
+def search_autocomplete():
+    q = request.args.get('q', '')
+    kind = request.args.get('kind', 'users')
+    if kind not in SEARCH_INDEXES:
+        return jsonify({'results': []}), 400
+    filters = {}
+    if kind == 'users' and request.args.get('role'):
+        filters['role'] = request.args.get('role')
+    records, _ = search_records(kind, q, per_page=app.config['SEARCH_AUTOCOMPLETE_LIMIT'], **filters)
+    label = {'users': 'username', 'events': 'name', 'locations': 'name'}[kind]
+    return jsonify({'results': [{'id': r.id, 'label': getattr(r, label)} for r in records]})
+
+# --- Admin: Background Jobs ---
+@app.route('/admin/jobs')
+@login_required
+@admin_required
+def list_jobs():
+    status = request.args.get('status')
+    query = Job.query
+    if status:
+        query = query.filter_by(status=status)
+    jobs = query.order_by(Job.id.desc()).limit(100).all()
+    return jsonify({'jobs': [job.to_dict() for job in jobs]})
+
+@app.route('/admin/jobs/<int:job_id>')
+@login_required
+@admin_required
+def job_status(job_id):
+    job = Job.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
 # --- Main Application Runner ---
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        ensure_autoincrement_ids()
+        init_search_index()
         # Create a default admin user if one doesn't exist
         if not User.query.filter_by(username='admin').first():
             print("Creating default admin user...")
@@ -463,4 +1040,5 @@ if __name__ == '__main__':
             db.session.add(admin_user)
             db.session.commit()
             print("Admin user created. Username: admin, Password: password")
-    app.run(debug=True)
+    # Job workers start with the first request, in the serving process only.
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1') != '0')
@@ -4,6 +4,9 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException # Import TimeoutException
+from bs4 import BeautifulSoup
+from contextlib import contextmanager
+import html
 import time
 import json
 import csv
@@ -19,6 +22,77 @@ MAIN_PAGE_URL = BASE_URL + '/' # <--- **UPDATE THIS URL**
 # Output file names
 OUTPUT_JSON_FILE = 'scraped_members_data_categorized.json'
 OUTPUT_CSV_FILE = 'scraped_members_data_categorized.csv'
+OUTPUT_REPORT_JSON_FILE = 'crawl_report.json'
+OUTPUT_REPORT_HTML_FILE = 'crawl_report.html'
+# Number of slowest 區域/行業分類 combinations listed in the crawl report
+REPORT_SLOWEST_COUNT = 10
+
+class CrawlMetrics:
+    """
+    Collects timing spans and counters for a crawl.
+    Spans can be nested; each stage is credited only with its own (exclusive) time,
+    so the stage breakdown adds up to the time actually spent.
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self.stage_totals = {}
+        self.counters = {'pages': 0, 'members': 0, 'duplicates': 0, 'timeouts': 0}
+        self.combinations = []
+        self.current = None
+        self._child_time = []  # Time spent in nested spans, one entry per open span
+
+    @contextmanager
+    def span(self, stage):
+        """Times a stage, attributing it to the current combination if there is one."""
+        self._child_time.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            exclusive = elapsed - self._child_time.pop()
+            if self._child_time:
+                self._child_time[-1] += elapsed
+            self.stage_totals[stage] = self.stage_totals.get(stage, 0.0) + exclusive
+            if self.current is not None:
+                stages = self.current['stages']
+                stages[stage] = stages.get(stage, 0.0) + exclusive
+
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def start_combination(self, region_text, industry_text):
+        self.current = {'區域': region_text, '行業分類': industry_text, 'stages': {},
+                        'members': 0, 'timed_out': False, 'error': None}
+        self.combinations.append(self.current)
+        return self.current
+
+    def end_combination(self):
+        if self.current is not None:
+            self.current['seconds'] = sum(self.current['stages'].values())
+            self.current = None
+
+    def report(self):
+        """Returns the crawl report as a JSON-serialisable dictionary."""
+        total_seconds = time.time() - self.started_at
+        stage_breakdown = [
+            {'stage': stage, 'seconds': round(seconds, 3),
+             'share': round(seconds / total_seconds, 3) if total_seconds else 0.0}
+            for stage, seconds in sorted(self.stage_totals.items(), key=lambda item: item[1], reverse=True)
+        ]
+        combinations = [
+            dict(c, seconds=round(c.get('seconds', 0.0), 3),
+                 stages={stage: round(seconds, 3) for stage, seconds in c['stages'].items()})
+            for c in self.combinations
+        ]
+        return {
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'total_seconds': round(total_seconds, 3),
+            'counters': self.counters,
+            'stage_breakdown': stage_breakdown,
+            'slowest_combinations': sorted(combinations, key=lambda c: c['seconds'], reverse=True)[:REPORT_SLOWEST_COUNT],
+            'combinations': combinations,
+        }
 
 def setup_driver():
     """Sets up and returns a Safari WebDriver instance."""
@@ -43,9 +117,10 @@ def extract_dropdown_options(soup, select_id):
                 options_list.append({'text': text, 'value': value})
     return options_list
 
-def extract_member_info_from_current_view(soup, current_region_text, current_industry_text):
+def extract_member_info_from_current_view(soup, current_region_text, current_industry_text, metrics):
     """
     Extracts member information from the currently displayed content on the page.
+    Time spent matching modals is recorded in `metrics` as its own stage.
     """
     members_on_page = []
     # The container for member items is assumed to be `div#show_padding`
@@ -89,36 +164,37 @@ def extract_member_info_from_current_view(soup, current_region_text, current_ind
             # For robustness, we will try to find a modal that contains the member_id directly within its content.
 
             # Iterate through all modal-body divs to find the one related to the current member
-            modal_body_elements = soup.find_all('div', class_='modal-body')
-            for modal_body in modal_body_elements:
-                modal_member_id_p = modal_body.find('label', string='會員編號:').find_next_sibling('div', class_='content-element-member').find('p') if modal_body.find('label', string='會員編號:') else None
-                modal_member_id = modal_member_id_p.get_text(strip=True) if modal_member_id_p else None
-
-                if modal_member_id == member_id:
-                    # Found the correct modal body for this member, extract all key-value pairs
-                    modal_label_elements = modal_body.find_all('label', class_='title-element-member')
-                    for m_label in modal_label_elements:
-                        m_label_text = m_label.get_text(strip=True).replace(':', '').strip()
-                        m_content_div = m_label.find_next_sibling('div', class_='content-element-member')
-                        if m_content_div:
-                            m_content_text = m_content_div.find('p').get_text(strip=True) if m_content_div.find('p') else m_content_div.get_text(strip=True)
+            with metrics.span('modal_match'):
+                modal_body_elements = soup.find_all('div', class_='modal-body')
+                for modal_body in modal_body_elements:
+                    modal_member_id_p = modal_body.find('label', string='會員編號:').find_next_sibling('div', class_='content-element-member').find('p') if modal_body.find('label', string='會員編號:') else None
+                    modal_member_id = modal_member_id_p.get_text(strip=True) if modal_member_id_p else None
+
+                    if modal_member_id == member_id:
+                        # Found the correct modal body for this member, extract all key-value pairs
+                        modal_label_elements = modal_body.find_all('label', class_='title-element-member')
+                        for m_label in modal_label_elements:
+                            m_label_text = m_label.get_text(strip=True).replace(':', '').strip()
+                            m_content_div = m_label.find_next_sibling('div', class_='content-element-member')
+                            if m_content_div:
+                                m_content_text = m_content_div.find('p').get_text(strip=True) if m_content_div.find('p') else m_content_div.get_text(strip=True)
                             
-                            # Handle special cases for social media/web links from image labels
-                            if m_label.find('img', src='assets/images/web.png'):
-                                link_tag = m_content_div.find('a', class_='hover-red')
-                                member_data['網址'] = link_tag['href'].strip() if link_tag and link_tag.get('href') else ''
-                            elif m_label.find('img', src='assets/images/facebook.png'):
-                                link_tag = m_content_div.find('a', class_='hover-red')
-                                member_data['Facebook'] = link_tag['href'].strip() if link_tag and link_tag.get('href') else ''
-                            elif m_label.find('img', src='assets/images/line.png'):
-                                link_tag = m_content_div.find('a', class_='hover-red')
-                                member_data['Line'] = link_tag['href'].strip() if link_tag and link_tag.get('href') else ''
-                            elif m_label.find('img', src='assets/images/wechat.png'):
-                                link_tag = m_content_div.find('a', class_='hover-red')
-                                member_data['WeChat'] = link_tag['href'].strip() if link_tag and link_tag.get('href') else ''
-                            elif m_label_text: # General case for other text labels
-                                member_data[m_label_text] = m_content_text
-                    break # Found and processed the modal for this member, break from modal loop
+                                # Handle special cases for social media/web links from image labels
+                                if m_label.find('img', src='assets/images/web.png'):
+                                    link_tag = m_content_div.find('a', class_='hover-red')
+                                    member_data['網址'] = link_tag['href'].strip() if link_tag and link_tag.get('href') else ''
+                                elif m_label.find('img', src='assets/images/facebook.png'):
+                                    link_tag = m_content_div.find('a', class_='hover-red')
+                                    member_data['Facebook'] = link_tag['href'].strip() if link_tag and link_tag.get('href') else ''
+                                elif m_label.find('img', src='assets/images/line.png'):
+                                    link_tag = m_content_div.find('a', class_='hover-red')
+                                    member_data['Line'] = link_tag['href'].strip() if link_tag and link_tag.get('href') else ''
+                                elif m_label.find('img', src='assets/images/wechat.png'):
+                                    link_tag = m_content_div.find('a', class_='hover-red')
+                                    member_data['WeChat'] = link_tag['href'].strip() if link_tag and link_tag.get('href') else ''
+                                elif m_label_text: # General case for other text labels
+                                    member_data[m_label_text] = m_content_text
+                        break # Found and processed the modal for this member, break from modal loop
 
             members_on_page.append(member_data)
     return members_on_page
@@ -130,33 +206,41 @@ def scrape_categorized_members():
 
     all_scraped_members_data = []
     unique_member_keys = set() # To store (member_id, company_name_chinese) tuples to avoid duplicates
+    metrics = CrawlMetrics()
 
     try:
         print(f"Navigating to main page: {MAIN_PAGE_URL}...")
-        driver.get(MAIN_PAGE_URL)
+        with metrics.span('navigation'):
+            driver.get(MAIN_PAGE_URL)
 
         # Give the page some time to load initial content and dropdowns
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.ID, "select-brand-list"))
-        )
+        try:
+            with metrics.span('wait'):
+                WebDriverWait(driver, 20).until(
+                    EC.presence_of_element_located((By.ID, "select-brand-list"))
+                )
+        except TimeoutException:
+            metrics.count('timeouts')
+            raise
         print("Page loaded. Extracting dropdown options...")
 
         # Get initial page source to extract all options
-        initial_soup = BeautifulSoup(driver.page_source, 'html.parser')
+        with metrics.span('page_source'):
+            initial_page_source = driver.page_source
+        with metrics.span('parse'):
+            initial_soup = BeautifulSoup(initial_page_source, 'html.parser')
+        metrics.count('pages')
 
-        # Extract all region options
+        # Extract all region and industry options
         region_options = extract_dropdown_options(initial_soup, 'select-brand-list')
+        industry_options = extract_dropdown_options(initial_soup, 'select-nghe-list')
         if not region_options:
             print("No region options found. Exiting.")
-            return []
-
-        # Extract all industry options
-        industry_options = extract_dropdown_options(initial_soup, 'select-nghe-list')
-        if not industry_options:
+        elif not industry_options:
             print("No industry options found. Exiting.")
-            return []
-
-        print(f"Found {len(region_options)} regions and {len(industry_options)} industries.")
+            region_options = [] # Nothing to combine with; skip straight to saving the report
+        else:
+            print(f"Found {len(region_options)} regions and {len(industry_options)} industries.")
 
         # Loop through each region
         for region_option in region_options:
@@ -164,38 +248,52 @@ def scrape_categorized_members():
             region_text = region_option['text']
             
             # Select the region in the live browser
-            region_dropdown = Select(driver.find_element(By.ID, "select-brand-list"))
-            region_dropdown.select_by_value(region_value)
+            with metrics.span('navigation'):
+                region_dropdown = Select(driver.find_element(By.ID, "select-brand-list"))
+                region_dropdown.select_by_value(region_value)
             
             # Allow time for the page/AJAX to update after region selection
-            time.sleep(2) # Adjust based on website responsiveness
+            with metrics.span('sleep'):
+                time.sleep(2) # Adjust based on website responsiveness
 
             # Loop through each industry
             for industry_option in industry_options:
                 industry_value = industry_option['value']
                 industry_text = industry_option['text']
+                combination = metrics.start_combination(region_text, industry_text)
 
                 # Select the industry in the live browser
-                industry_dropdown = Select(driver.find_element(By.ID, "select-nghe-list"))
-                industry_dropdown.select_by_value(industry_value)
+                with metrics.span('navigation'):
+                    industry_dropdown = Select(driver.find_element(By.ID, "select-nghe-list"))
+                    industry_dropdown.select_by_value(industry_value)
                 
                 # Allow time for the page/AJAX to update after industry selection
                 try:
                     # Wait for at least one member item to be present to indicate content loaded
-                    WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.CLASS_NAME, "member-item"))
-                    )
+                    with metrics.span('wait'):
+                        WebDriverWait(driver, 10).until(
+                            EC.presence_of_element_located((By.CLASS_NAME, "member-item"))
+                        )
                     print(f"  Scraping: 區域='{region_text}', 行業分類='{industry_text}'")
                 except TimeoutException:
                     print(f"  No member items found for 區域='{region_text}', 行業分類='{industry_text}' after waiting. Skipping.")
+                    combination['timed_out'] = True
+                    metrics.count('timeouts')
+                    metrics.end_combination()
                     continue # Skip to the next combination if no content loads
 
                 # Get the page source after selecting both filters
-                current_page_source = driver.page_source
-                current_soup = BeautifulSoup(current_page_source, 'html.parser')
+                with metrics.span('page_source'):
+                    current_page_source = driver.page_source
+                with metrics.span('parse'):
+                    current_soup = BeautifulSoup(current_page_source, 'html.parser')
+                metrics.count('pages')
 
                 # Extract data from the current view. Pass the full soup for modal lookup.
-                members_on_view = extract_member_info_from_current_view(current_soup, region_text, industry_text)
+                with metrics.span('extract'):
+                    members_on_view = extract_member_info_from_current_view(current_soup, region_text, industry_text, metrics)
+                combination['members'] = len(members_on_view)
+                metrics.count('members', len(members_on_view))
                 
                 for member_data in members_on_view:
                     # Create a unique key for the member based on ID and Chinese name
@@ -209,19 +307,28 @@ def scrape_categorized_members():
                     # If unique_key is None (e.g., if member_id is 'N/A'), still add if not duplicate
                     elif not unique_key and member_data not in all_scraped_members_data:
                         all_scraped_members_data.append(member_data)
+                    else:
+                        metrics.count('duplicates')
                 
                 # Add a small delay between each industry selection
-                time.sleep(1)
+                with metrics.span('sleep'):
+                    time.sleep(1)
+                metrics.end_combination()
+                print(f"    {combination['members']} members in {combination['seconds']:.2f}s")
 
             # Add a small delay after each region selection
-            time.sleep(2)
+            with metrics.span('sleep'):
+                time.sleep(2)
 
     except Exception as e:
         print(f"An unexpected error occurred during the scraping process: {e}")
+        if metrics.current is not None:
+            metrics.current['error'] = f"{type(e).__name__}: {e}"
     finally:
         if driver:
             print("\nClosing Safari browser...")
             driver.quit()
+        metrics.end_combination()
 
     # --- Save the collected data ---
     if all_scraped_members_data:
@@ -230,6 +337,8 @@ def scrape_categorized_members():
         save_data_to_csv(all_scraped_members_data, OUTPUT_CSV_FILE)
     else:
         print("\nNo member data was collected.")
+
+    save_crawl_report(metrics.report(), OUTPUT_REPORT_JSON_FILE, OUTPUT_REPORT_HTML_FILE)
     
     return all_scraped_members_data
 
@@ -263,6 +372,40 @@ def save_data_to_csv(data, filename):
     except Exception as e:
         print(f"Error saving to CSV: {e}")
 
+def save_crawl_report(report, json_filename, html_filename):
+    """Saves the crawl report as JSON and as a standalone HTML page."""
+    save_data_to_json(report, json_filename)
+
+    def table(headers, rows):
+        head = ''.join(f'<th>{html.escape(str(h))}</th>' for h in headers)
+        body = ''.join('<tr>' + ''.join(f'<td>{html.escape(str(cell))}</td>' for cell in row) + '</tr>' for row in rows)
+        return f'<table><tr>{head}</tr>{body}</table>'
+
+    stage_names = [entry['stage'] for entry in report['stage_breakdown']]
+    page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Crawl Report</title>
+<style>body {{ font-family: sans-serif; }} table {{ border-collapse: collapse; margin-bottom: 2em; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: left; }}</style></head>
+<body>
+<h1>Crawl Report</h1>
+<p>Started {html.escape(report['started_at'])}, total {report['total_seconds']:.1f}s</p>
+<h2>Counters</h2>
+{table(['Counter', 'Value'], report['counters'].items())}
+<h2>Stage Breakdown</h2>
+{table(['Stage', 'Seconds', 'Share'], [(e['stage'], f"{e['seconds']:.2f}", f"{e['share']:.1%}") for e in report['stage_breakdown']])}
+<h2>Slowest Combinations</h2>
+{table(['區域', '行業分類', 'Members', 'Timed out', 'Error', 'Seconds'] + stage_names,
+       [[c['區域'], c['行業分類'], c['members'], c['timed_out'], c['error'] or '', f"{c['seconds']:.2f}"]
+        + [f"{c['stages'].get(stage, 0.0):.2f}" for stage in stage_names] for c in report['slowest_combinations']])}
+</body></html>
+"""
+    try:
+        with open(html_filename, 'w', encoding='utf-8') as f:
+            f.write(page)
+        print(f"Crawl report saved to {html_filename}")
+    except Exception as e:
+        print(f"Error saving crawl report: {e}")
+
 if __name__ == "__main__":
     print("Starting Selenium + BeautifulSoup extraction example for categorized members...")
     print("---------------------------------------")